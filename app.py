@@ -1,22 +1,46 @@
 import os
+import httpx
 import requests
-import feedparser
-from flask import Flask, jsonify, request, render_template
-from datetime import datetime, timedelta
-import json
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import orjson
+from flask import Flask, Response, jsonify, request, render_template
+from flask.json.provider import DefaultJSONProvider
+from flask_caching import Cache
+from apscheduler.schedulers.background import BackgroundScheduler
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
 import re
-from urllib.parse import quote_plus
+import threading
+import time
+from types import MappingProxyType
+from concurrent.futures import Future, ThreadPoolExecutor
+from urllib.parse import parse_qsl, quote_plus, urlencode
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
+class ORJSONProvider(DefaultJSONProvider):
+    """JSON provider that encodes with orjson, which is much faster than the stdlib encoder on our catalog payloads."""
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(orjson.dumps(obj, default=self.default), mimetype=self.mimetype)
+
 app = Flask(__name__)
+app.json = ORJSONProvider(app) # Used by jsonify()
 
 # --- Configuration (from environment variables for security) ---
 TMDB_API_KEY = os.getenv("TMDB_API_KEY")
 TRAKT_CLIENT_ID = os.getenv("TRAKT_CLIENT_ID")
 TRAKT_CLIENT_SECRET = os.getenv("TRAKT_CLIENT_SECRET") # Only if you do server-side OAuth
+REDIS_URL = os.getenv("REDIS_URL") # e.g. redis://localhost:6379/0
 # Add a way to store user-specific Trakt access tokens if implementing user login
 # For now, we'll assume public Trakt lists or require user to configure Trakt in Stremio settings
 
@@ -26,10 +50,78 @@ EZTV_RSS_FEED = "https://myrss.org/eztv"
 BASE_TMDB_URL = "https://api.themoviedb.org/3"
 BASE_TRAKT_URL = "https://api.trakt.tv"
 
-# Cache for API responses (simple in-memory for demonstration)
-# In a production environment, use Redis or a more persistent cache
-cache = {}
-CACHE_TIMEOUT = timedelta(minutes=30) # Cache items for 30 minutes
+# EZTV titles look like "Show Name S01E02 ..." or "Show Name Season 1 Episode 2 ..."
+EZTV_TITLE_RE = re.compile(r"^(.*?)(?: Season (\d+) Episode (\d+)| S(\d+)E(\d+))", re.IGNORECASE)
+NON_EN_RE = re.compile(r'\b(spanish|french|german|italian|russian|korean|japanese)\b', re.IGNORECASE)
+
+# The EZTV feed is polled in the background; entries outlive a few failed polls
+EZTV_REFRESH_MINUTES = 5
+EZTV_LOCK_TIMEOUT = EZTV_REFRESH_MINUTES * 60 - 30 # Expires just before the next poll is due
+EZTV_CACHE_TIMEOUT = 3600
+EZTV_TITLE_MISS_TIMEOUT = 24 * 3600 # Retry titles TMDb couldn't match once a day
+
+REQUEST_TIMEOUT = 5 # Seconds per upstream API call
+RETRY_STATUSES = [429, 500, 502, 503, 504] # Rate limited or transient server errors
+MAX_RETRIES = 5
+TMDB_RETRY_BUDGET = 10 # Seconds a TMDb call may spend retrying before we give up on it
+
+def make_session():
+    """Creates a requests session that keeps connections alive and retries transient API errors."""
+    session = requests.Session()
+    retry = Retry(total=MAX_RETRIES, backoff_factor=1, status_forcelist=RETRY_STATUSES, allowed_methods=["GET"])
+    adapter = HTTPAdapter(pool_connections=20, pool_maxsize=50, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+# Worker threads for parallel TMDb lookups, shared by all requests in this process
+EXECUTOR = ThreadPoolExecutor(max_workers=16)
+
+# Shared clients so repeated API calls reuse pooled keep-alive connections instead of a new TLS handshake each time.
+# TMDb is hit dozens of times per catalog page, so its calls are multiplexed over HTTP/2.
+TMDB_CLIENT = httpx.Client(
+    base_url=BASE_TMDB_URL,
+    transport=httpx.HTTPTransport(http2=True, retries=3, limits=httpx.Limits(max_connections=32)), # retries= covers connection errors only
+    timeout=REQUEST_TIMEOUT
+)
+TRAKT_SESSION = make_session()
+
+# Cache for API responses, shared by all gunicorn workers through Redis.
+# Without REDIS_URL (e.g. local testing) we fall back to a per-process in-memory cache.
+CACHE_TIMEOUT = 1800 # Cache items for 30 minutes
+
+# (fresh, stale) lifetimes in seconds for get_cached_response, per kind of payload
+TTL_DISCOVER = (3600, 6 * 3600) # Discover/trending pages
+TTL_META = (24 * 3600, 7 * 24 * 3600) # Movie/show details barely change
+cache = Cache(app, config={
+    "CACHE_TYPE": "RedisCache" if REDIS_URL else "SimpleCache",
+    "CACHE_REDIS_URL": REDIS_URL,
+    "CACHE_KEY_PREFIX": "stremio_addon_hub:",
+    "CACHE_DEFAULT_TIMEOUT": CACHE_TIMEOUT,
+    "CACHE_OPTIONS": {"socket_connect_timeout": 1, "socket_timeout": 1} if REDIS_URL else {} # Don't hang requests on a dead Redis
+})
+
+# The cache must never take the addon down: if the backend is unreachable, reads count as
+# misses (so callers fetch fresh data) and writes are skipped.
+def cache_get(key):
+    try:
+        return cache.get(key)
+    except Exception as e:
+        print(f"Cache read failed ({key}): {e}")
+        return None
+
+def cache_get_many(*keys):
+    try:
+        return cache.get_many(*keys)
+    except Exception as e:
+        print(f"Cache read failed ({len(keys)} keys): {e}")
+        return [None] * len(keys)
+
+def cache_set(key, value, timeout=None):
+    try:
+        cache.set(key, value, timeout=timeout)
+    except Exception as e:
+        print(f"Cache write failed ({key}): {e}")
 
 GENRES_MOVIE = [
     "Action", "Adventure", "Animation", "Comedy", "Crime", "Documentary",
@@ -48,69 +140,126 @@ GENRES_ANIME = [
     "Mystery", "Romance", "Sci-Fi", "Slice of Life", "Sports", "Supernatural", "Thriller"
 ]
 
+# TMDb genre IDs by name. These rarely change; fetch TMDB's genre list
+# (tmdb_request("genre/movie/list")) if you need to refresh them.
+_GENRE_IDS_MOVIE = MappingProxyType({
+    "Action": 28, "Adventure": 12, "Animation": 16, "Comedy": 35, "Crime": 80,
+    "Documentary": 99, "Drama": 18, "Family": 10751, "Fantasy": 14,
+    "History": 36, "Horror": 27, "Music": 10402, "Mystery": 9648,
+    "Romance": 10749, "Science Fiction": 878, "TV Movie": 10770, "Thriller": 53,
+    "War": 10752, "Western": 37
+})
+
+_GENRE_IDS_TV = MappingProxyType({ # TMDb TV show genre IDs are different!
+    "Action & Adventure": 10759, "Animation": 16, "Comedy": 35, "Crime": 80,
+    "Documentary": 99, "Drama": 18, "Family": 10751, "Kids": 10762,
+    "Mystery": 9648, "News": 10763, "Reality": 10764, "Sci-Fi & Fantasy": 10765,
+    "Soap": 10766, "Talk": 10767, "War & Politics": 10768, "Western": 37
+})
+
 # Helper function for caching
-def get_cached_response(key, fetch_function):
-    now = datetime.now()
-    if key in cache and (now - cache[key]['timestamp']) < CACHE_TIMEOUT:
-        return cache[key]['data']
-    
-    data = fetch_function()
-    if data:
-        cache[key] = {'data': data, 'timestamp': now}
-    return data
+# Within `fresh` seconds cached data is served as-is; after that and until `stale` seconds it is
+# still served immediately while a background refresh fetches a new copy. Only a miss blocks.
+def get_cached_response(key, fetch_function, fresh=300, stale=1800):
+    entry = cache_get(key)
+    if entry is not None:
+        if time.time() >= entry['fresh_until'] and key not in _inflight:
+            EXECUTOR.submit(refresh_cached_response, key, fetch_function, fresh, stale)
+        return entry['data']
+
+    return refresh_cached_response(key, fetch_function, fresh, stale)
+
+# Fetches currently running in this process, by cache key. Concurrent misses for the same key
+# wait on the first caller's fetch instead of each hitting TMDb (single-flight).
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+def refresh_cached_response(key, fetch_function, fresh, stale):
+    with _inflight_lock:
+        future = _inflight.get(key)
+        is_leader = future is None
+        if is_leader:
+            future = _inflight[key] = Future()
+    if not is_leader:
+        return future.result()
+
+    try:
+        data = fetch_function()
+        if data:
+            now = time.time()
+            entry = {'data': data, 'fresh_until': now + fresh, 'stale_until': now + stale}
+            cache_set(key, entry, timeout=stale) # The cache backend drops the entry once it's too stale
+        future.set_result(data)
+        return data
+    except BaseException as e: # Never leave waiters hanging, even on a gevent timeout
+        future.set_exception(e)
+        raise
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
 
 # --- TMDb Helpers ---
+def retry_after_seconds(response):
+    """Returns how long a 429/503 response asks us to wait (Retry-After in seconds or as a date), or None."""
+    retry_after = response.headers.get("Retry-After")
+    if not retry_after:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(retry_after) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
 def tmdb_request(endpoint, params=None):
     if not TMDB_API_KEY:
         print("TMDB_API_KEY not set. Please set it in your .env file.")
         return None
     
-    url = f"{BASE_TMDB_URL}/{endpoint}"
     full_params = {"api_key": TMDB_API_KEY, "language": "en-US"}
     if params:
         full_params.update(params)
     
     try:
-        response = requests.get(url, params=full_params)
+        deadline = time.monotonic() + TMDB_RETRY_BUDGET
+        for attempt in range(MAX_RETRIES + 1):
+            response = TMDB_CLIENT.get(endpoint, params=full_params)
+            if response.status_code not in RETRY_STATUSES or attempt == MAX_RETRIES:
+                break
+            # Back off before retrying a rate limit or server error, as long as the user can still wait
+            delay = retry_after_seconds(response)
+            if delay is None:
+                delay = 2 ** attempt
+            if time.monotonic() + delay >= deadline:
+                break
+            time.sleep(delay)
         response.raise_for_status() # Raise an exception for HTTP errors
-        return response.json()
-    except requests.exceptions.RequestException as e:
+        return orjson.loads(response.content) # Much faster than the stdlib decoder on large discover pages
+    except (httpx.HTTPError, orjson.JSONDecodeError) as e:
         print(f"Error fetching from TMDb API ({endpoint}): {e}")
         return None
 
 def get_tmdb_genre_id(genre_name, type_):
-    # This assumes a mapping. In a real app, you'd fetch TMDB's genre list once.
-    # For simplicity, we'll use a hardcoded mapping or try to guess.
-    # It's better to fetch TMDB genres and map them.
-    # Example: tmdb_request("genre/movie/list")
-    
-    # A simplified lookup - for actual use, map the genre names to their IDs.
-    # For now, we'll rely on TMDb's 'with_genres' filter expecting IDs.
-    # This requires knowing TMDb's genre IDs beforehand, or fetching them.
-    
-    genre_map = {
-        "movie": {
-            "Action": 28, "Adventure": 12, "Animation": 16, "Comedy": 35, "Crime": 80,
-            "Documentary": 99, "Drama": 18, "Family": 10751, "Fantasy": 14,
-            "History": 36, "Horror": 27, "Music": 10402, "Mystery": 9648,
-            "Romance": 10749, "Science Fiction": 878, "TV Movie": 10770, "Thriller": 53,
-            "War": 10752, "Western": 37
-        },
-        "tv": { # TMDb TV show genre IDs are different!
-            "Action & Adventure": 10759, "Animation": 16, "Comedy": 35, "Crime": 80,
-            "Documentary": 99, "Drama": 18, "Family": 10751, "Kids": 10762,
-            "Mystery": 9648, "News": 10763, "Reality": 10764, "Sci-Fi & Fantasy": 10765,
-            "Soap": 10766, "Talk": 10767, "War & Politics": 10768, "Western": 37
-        }
-    }
-    
-    if type_ == "series": # Stremio type "series" maps to TMDb type "tv"
-        return genre_map.get("tv", {}).get(genre_name)
+    # TMDb's 'with_genres' filter expects genre IDs, so map the names we show in Stremio.
+    if type_ in ("series", "tv"): # Stremio type "series" maps to TMDb type "tv"
+        return _GENRE_IDS_TV.get(genre_name)
     elif type_ == "movie":
-        return genre_map.get("movie", {}).get(genre_name)
+        return _GENRE_IDS_MOVIE.get(genre_name)
     return None
 
 
+# Ask for IMDb IDs, cast/crew and trailers in the same round-trip as the details
+DETAIL_PARAMS = {"append_to_response": "external_ids,credits,videos"}
+
+def get_trailer(data):
+    """Returns the YouTube key of the first official trailer in an append_to_response=videos payload."""
+    for video in data.get("videos", {}).get("results", []):
+        if video.get("site") == "YouTube" and video.get("type") == "Trailer":
+            return video.get("key")
+    return None
+
 def get_meta_from_tmdb(id_type, id_val, media_type):
     """Fetches detailed metadata from TMDb using IMDb ID (or TMDB ID if preferred)."""
     if id_type == "imdb":
@@ -119,19 +268,19 @@ def get_meta_from_tmdb(id_type, id_val, media_type):
         if find_result:
             if media_type == "movie" and find_result.get("movie_results"):
                 tmdb_id = find_result["movie_results"][0]["id"]
-                data = tmdb_request(f"movie/{tmdb_id}")
+                data = tmdb_request(f"movie/{tmdb_id}", params=DETAIL_PARAMS)
             elif media_type == "series" and find_result.get("tv_results"):
                 tmdb_id = find_result["tv_results"][0]["id"]
-                data = tmdb_request(f"tv/{tmdb_id}")
+                data = tmdb_request(f"tv/{tmdb_id}", params=DETAIL_PARAMS)
             else:
                 return None
         else:
             return None
     elif id_type == "tmdb": # If you ever pass direct TMDB IDs
         if media_type == "movie":
-            data = tmdb_request(f"movie/{id_val}")
+            data = tmdb_request(f"movie/{id_val}", params=DETAIL_PARAMS)
         elif media_type == "series":
-            data = tmdb_request(f"tv/{id_val}")
+            data = tmdb_request(f"tv/{id_val}", params=DETAIL_PARAMS)
         else:
             return None
     else:
@@ -147,7 +296,7 @@ def get_meta_from_tmdb(id_type, id_val, media_type):
 
     if media_type == "movie":
         return {
-            "id": f"tt{data['imdb_id']}" if data.get('imdb_id') else f"tmdb:{data['id']}",
+            "id": data.get('imdb_id') or f"tmdb:{data['id']}", # TMDb IMDb IDs already start with "tt"
             "name": data.get("title"),
             "poster": poster,
             "posterShape": "regular",
@@ -157,13 +306,15 @@ def get_meta_from_tmdb(id_type, id_val, media_type):
             "genres": [g["name"] for g in data.get("genres", [])],
             "imdbRating": f"{data.get('vote_average'):.1f}" if data.get('vote_average') else None,
             "type": "movie",
-            "trailer": None, # You can add logic to get trailers from TMDb videos
+            "trailer": get_trailer(data),
             "runtime": f"{data.get('runtime')} min" if data.get('runtime') else None,
-            "director": ", ".join([crew["name"] for crew in data.get("credits", {}).get("crew", []) if crew["job"] == "Director"])
+            "director": ", ".join([crew["name"] for crew in data.get("credits", {}).get("crew", []) if crew["job"] == "Director"]),
+            # A movie is a single video, so Stremio can go straight to its streams
+            "behaviorHints": {"defaultVideoId": data["imdb_id"]} if data.get("imdb_id") else {}
         }
     elif media_type == "series":
         return {
-            "id": f"tt{data['external_ids']['imdb_id']}" if data.get('external_ids', {}).get('imdb_id') else f"tmdb:{data['id']}",
+            "id": data.get('external_ids', {}).get('imdb_id') or f"tmdb:{data['id']}",
             "name": data.get("name"),
             "poster": poster,
             "posterShape": "regular",
@@ -173,19 +324,65 @@ def get_meta_from_tmdb(id_type, id_val, media_type):
             "genres": [g["name"] for g in data.get("genres", [])],
             "imdbRating": f"{data.get('vote_average'):.1f}" if data.get('vote_average') else None,
             "type": "series",
-            "trailer": None,
+            "trailer": get_trailer(data),
             "country": data.get("origin_country")[0] if data.get("origin_country") else None,
             "status": data.get("status"),
             "runtime": f"{data.get('episode_run_time')[0]} min" if data.get('episode_run_time') else None,
             "videos": [], # For episode streams, Stremio will ask for episodes, not a single video.
             "behaviorHints": {
-                "has)episodes": True
+                "hasScheduledVideos": bool(data.get("next_episode_to_air")) # Lets Stremio show upcoming episodes in its calendar
             },
             "totalSeasons": data.get("number_of_seasons"),
             "totalEpisodes": data.get("number_of_episodes")
         }
     return None
 
+def lookup_show(show_name):
+    """Maps an EZTV show name to its TMDb details ({} if it can't be matched) and remembers the answer."""
+    show = {}
+    # Attempt to find TMDb ID for the show
+    search_results = tmdb_request("search/tv", params={"query": show_name})
+    if search_results and search_results.get("results"):
+        tmdb_show = search_results["results"][0]
+        # The details call carries the IMDb ID (via append_to_response) and the genre names,
+        # which search results don't include
+        details = tmdb_request(f"tv/{tmdb_show['id']}", params={"append_to_response": "external_ids"})
+        if details is None:
+            return show # TMDb request failed; don't remember a miss we aren't sure about
+        imdb_id = details.get("external_ids", {}).get("imdb_id")
+        if imdb_id and imdb_id.startswith("tt"):
+            show = {
+                "imdb_id": imdb_id,
+                "name": tmdb_show.get("name"),
+                "poster_path": tmdb_show.get("poster_path"),
+                "first_air_date": tmdb_show.get("first_air_date", ""),
+                "genre_ids": tmdb_show.get("genre_ids", []),
+                "genres": [g["name"] for g in details.get("genres", [])]
+            }
+    elif search_results is None:
+        return show # TMDb request failed; don't remember a miss we aren't sure about
+
+    # A title maps to the same show forever; unmatched titles are retried once TMDb may have them
+    cache_set(f"eztv_title:{show_name}", show, timeout=0 if show else EZTV_TITLE_MISS_TIMEOUT)
+    return show
+
+def show_to_item(show, tmdb_genre_id=None):
+    """Builds the Stremio catalog item for a lookup_show() result, or None if it's unmatched or filtered out."""
+    if not show:
+        return None
+    # Filter by genre if provided
+    if tmdb_genre_id and tmdb_genre_id not in show["genre_ids"]:
+        return None # Skip if genre doesn't match
+
+    return {
+        "id": show["imdb_id"],
+        "type": "series",
+        "name": show["name"],
+        "poster": f"https://image.tmdb.org/t/p/w500{show['poster_path']}" if show["poster_path"] else None,
+        "releaseInfo": show["first_air_date"][:4],
+        "genres": show["genres"]
+    }
+
 # --- Trakt Helpers ---
 def trakt_request(endpoint, params=None):
     if not TRAKT_CLIENT_ID:
@@ -200,99 +397,100 @@ def trakt_request(endpoint, params=None):
     }
     
     try:
-        response = requests.get(url, headers=headers, params=params)
+        response = TRAKT_SESSION.get(url, headers=headers, params=params, timeout=REQUEST_TIMEOUT)
         response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
+        return orjson.loads(response.content)
+    except (requests.exceptions.RequestException, orjson.JSONDecodeError) as e:
         print(f"Error fetching from Trakt API ({endpoint}): {e}")
         return None
 
-# --- Addon Endpoints ---
-
-@app.route('/manifest.json')
-def manifest():
-    with open('manifest.json', 'r') as f:
-        return jsonify(json.load(f))
+# --- Request Helpers ---
+def parse_extra_args(extra_args):
+    """Parses Stremio's catalog extras path segment, e.g. "genre=Science%20Fiction&skip=20"."""
+    if not extra_args:
+        return {}
+    # The WSGI server has already percent-decoded the path, which turns an encoded "&"
+    # (e.g. "Action %26 Adventure") into a separator. Use the raw URI when the server provides it.
+    raw_uri = request.environ.get("RAW_URI") or request.environ.get("REQUEST_URI")
+    if raw_uri:
+        extra_args = raw_uri.split("?", 1)[0].rsplit("/", 1)[-1].removesuffix(".json")
+    return dict(parse_qsl(extra_args))
+
+def catalog_cache_key(type_, id_, extra_args):
+    """Keys rendered catalog pages on the parsed extras, so URIs that decode to the same path but
+    parse differently (an encoded vs. a literal "&") never share a cache entry."""
+    extra = parse_extra_args(extra_args)
+    return f"view/catalog/{type_}/{id_}?{urlencode(sorted(extra.items()))}"
+
+# --- EZTV Helpers ---
+def fetch_eztv_shows():
+    # This is a challenging part: mapping EZTV titles to TMDb IDs
+    # For simplicity, we'll just parse the feed and try to guess.
+    # A more robust solution would involve a dedicated TV show lookup service.
+    import feedparser # Heavy XML machinery; only this background job needs it, so keep it off the import path
+    feed = feedparser.parse(EZTV_RSS_FEED)
+    # The feed lists every episode; keep only the newest entry per show (in feed order)
+    entries = {}
+    published_at = {}
+    for entry in feed.entries:
+        title = entry.title
+        lower_title = title.lower()
+        # Simple regex to extract show name and episode info
+        match = EZTV_TITLE_RE.match(title)
+        if match:
+            show_name = match.group(1).strip()
+            # Only add if it contains "english" or not explicitly non-english
+            if "english" in lower_title or not NON_EN_RE.search(lower_title):
+                key = show_name.casefold()
+                published = entry.get("published_parsed")
+                if key not in entries or (published and published_at[key] and published > published_at[key]):
+                    entries[key] = {"title": show_name, "link": entry.link, "published": entry.published}
+                    published_at[key] = published
+    return list(entries.values())
+
+def refresh_eztv():
+    """Background job: re-parses the EZTV feed and stores the entries for latest_tv_shows."""
+    entries = fetch_eztv_shows()
+    if entries:
+        cache_set("eztv_latest_shows", entries, timeout=EZTV_CACHE_TIMEOUT)
+    else:
+        # Keep serving the previous entries until the feed comes back
+        print("EZTV feed returned no entries, keeping the cached ones.")
 
-@app.route('/catalog/<type_>/<id_>.json')
-@app.route('/catalog/<type_>/<id_>/<extra_args>.json')
-def catalog(type_, id_, extra_args=None):
-    catalog_id = id_
-    extra = {}
-    if extra_args:
-        # Parse extra_args like "genre=Action&skip=10"
-        for param in extra_args.split('&'):
-            if '=' in param:
-                key, value = param.split('=', 1)
-                extra[key] = value
-
-    genre = extra.get('genre')
-    year = extra.get('year')
-    skip = int(extra.get('skip', 0))
+# --- Catalog Builders ---
+def get_catalog_items(catalog_id, genre=None, year=None, skip=0):
+    """Builds the Stremio items for one catalog page. Shared by the catalog route and the cache pre-warmer."""
     page = (skip // 20) + 1 # Assuming 20 items per page for Stremio catalogs
 
     items = []
 
     if catalog_id == "latest_tv_shows":
-        # Get new shows from Eztv RSS
-        # This is a challenging part: mapping EZTV titles to TMDb IDs
-        # For simplicity, we'll just parse the feed and try to guess.
-        # A more robust solution would involve a dedicated TV show lookup service.
-        def fetch_eztv_shows():
-            feed = feedparser.parse(EZTV_RSS_FEED)
-            entries = []
-            for entry in feed.entries:
-                title = entry.title
-                # Simple regex to extract show name and episode info
-                match = re.match(r"^(.*?)(?: Season (\d+) Episode (\d+)| S(\d+)E(\d+))", title, re.IGNORECASE)
-                if match:
-                    show_name = match.group(1).strip()
-                    # Only add if it contains "english" or not explicitly non-english
-                    if "english" in title.lower() or not re.search(r'\b(spanish|french|german|italian|russian|korean|japanese)\b', title.lower()):
-                         entries.append({"title": show_name, "link": entry.link, "published": entry.published})
-            return entries
-
-        eztv_entries = get_cached_response("eztv_latest_shows", fetch_eztv_shows)
-        
-        processed_shows = set() # To avoid duplicates for the same show
-        count = 0
-        for entry in eztv_entries:
-            if count >= 50 + skip: # Limit to process max 50 entries + skip
-                break
-            
-            show_name = entry["title"]
-            if show_name in processed_shows:
-                continue
-            
-            # Attempt to find TMDb ID for the show
-            search_results = tmdb_request("search/tv", params={"query": show_name})
-            if search_results and search_results.get("results"):
-                tmdb_show = search_results["results"][0]
-                # Filter by genre if provided
-                if genre:
-                    tmdb_genre_id = get_tmdb_genre_id(genre, "series")
-                    if tmdb_genre_id and tmdb_genre_id not in tmdb_show.get('genre_ids', []):
-                        continue # Skip if genre doesn't match
-                
-                imdb_id = None
-                external_ids = tmdb_request(f"tv/{tmdb_show['id']}/external_ids")
-                if external_ids and external_ids.get("imdb_id"):
-                    imdb_id = external_ids["imdb_id"]
-                
-                if imdb_id and imdb_id.startswith("tt"):
-                    items.append({
-                        "id": imdb_id,
-                        "type": "series",
-                        "name": tmdb_show.get("name"),
-                        "poster": f"https://image.tmdb.org/t/p/w500{tmdb_show['poster_path']}" if tmdb_show.get("poster_path") else None,
-                        "releaseInfo": tmdb_show.get("first_air_date", "")[:4],
-                        "genres": [g["name"] for g in tmdb_show.get("genres", [])] # This won't be in search results direct
-                    })
-                    processed_shows.add(show_name)
-                    count += 1
+        # Get new shows from Eztv RSS. The feed is polled by a background job (see refresh_eztv),
+        # so the request only reads the last parsed entries from the cache.
+        eztv_entries = cache_get("eztv_latest_shows") or []
+        tmdb_genre_id = get_tmdb_genre_id(genre, "series") if genre else None
+
+        # The entries are already one per show; unseen shows are looked up in parallel below
+        show_names = [entry["title"] for entry in eztv_entries[:50 + skip]] # Limit to process max 50 shows + skip
+        # Titles we've mapped before need no TMDb calls (one cache round-trip for all of them)
+        known_shows = cache_get_many(*(f"eztv_title:{show_name}" for show_name in show_names)) if show_names else []
+        shows = [
+            show if show is not None else EXECUTOR.submit(lookup_show, show_name)
+            for show_name, show in zip(show_names, known_shows)
+        ]
+        # Walk the shows in feed order so the newest stay first
+        for show in shows:
+            if isinstance(show, Future):
+                show = show.result()
+            item = show_to_item(show, tmdb_genre_id)
+            if item:
+                items.append(item)
             if len(items) >= 20: # Stremio usually fetches 100 items per catalog page if not limited
                 break
-        
+        for show in shows:
+            if isinstance(show, Future):
+                show.cancel() # Drop lookups we no longer need that haven't started yet
+
     elif catalog_id == "latest_movie_releases":
         params = {"primary_release_date.gte": (datetime.now() - timedelta(days=90)).strftime('%Y-%m-%d'), # Last 90 days
                   "sort_by": "popularity.desc",
@@ -305,7 +503,7 @@ def catalog(type_, id_, extra_args=None):
             if tmdb_genre_id:
                 params["with_genres"] = tmdb_genre_id
         
-        movies_data = get_cached_response(f"tmdb_latest_movies_{genre}_{year}_{page}", lambda: tmdb_request("discover/movie", params=params))
+        movies_data = get_cached_response(f"tmdb_latest_movies_{genre}_{year}_{page}", lambda: tmdb_request("discover/movie", params=params), *TTL_DISCOVER)
         if movies_data and movies_data.get("results"):
             for movie in movies_data["results"]:
                 if movie.get("original_language") == "en": # Ensure English content
@@ -333,7 +531,7 @@ def catalog(type_, id_, extra_args=None):
             if tmdb_genre_id:
                 params["with_genres"] = f"{get_tmdb_genre_id('Animation', 'series')},{tmdb_genre_id}"
         
-        anime_data = get_cached_response(f"tmdb_latest_anime_{genre}_{page}", lambda: tmdb_request("discover/tv", params=params))
+        anime_data = get_cached_response(f"tmdb_latest_anime_{genre}_{page}", lambda: tmdb_request("discover/tv", params=params), *TTL_DISCOVER)
         if anime_data and anime_data.get("results"):
             for anime_show in anime_data["results"]:
                 # Basic filter: check if it's animation and has some popularity
@@ -354,7 +552,7 @@ def catalog(type_, id_, extra_args=None):
             if tmdb_genre_id:
                 params["with_genres"] = tmdb_genre_id
         
-        trending_data = get_cached_response(f"tmdb_trending_movies_{genre}_{page}", lambda: tmdb_request("trending/movie/week", params=params))
+        trending_data = get_cached_response(f"tmdb_trending_movies_{genre}_{page}", lambda: tmdb_request("trending/movie/week", params=params), *TTL_DISCOVER)
         if trending_data and trending_data.get("results"):
             for movie in trending_data["results"][:20]: # Limit to top 20
                 if movie.get("original_language") == "en":
@@ -374,7 +572,7 @@ def catalog(type_, id_, extra_args=None):
             if tmdb_genre_id:
                 params["with_genres"] = tmdb_genre_id
 
-        trending_data = get_cached_response(f"tmdb_trending_tv_{genre}_{page}", lambda: tmdb_request("trending/tv/week", params=params))
+        trending_data = get_cached_response(f"tmdb_trending_tv_{genre}_{page}", lambda: tmdb_request("trending/tv/week", params=params), *TTL_DISCOVER)
         if trending_data and trending_data.get("results"):
             for tv_show in trending_data["results"][:20]: # Limit to top 20
                 if tv_show.get("original_language") == "en":
@@ -402,7 +600,7 @@ def catalog(type_, id_, extra_args=None):
                 params["with_genres"] = tmdb_genre_id
         
         # Example: Popular movies released recently, highly rated
-        recommended_data = get_cached_response(f"tmdb_recommended_movies_{genre}_{page}", lambda: tmdb_request("discover/movie", params=params))
+        recommended_data = get_cached_response(f"tmdb_recommended_movies_{genre}_{page}", lambda: tmdb_request("discover/movie", params=params), *TTL_DISCOVER)
         if recommended_data and recommended_data.get("results"):
             for movie in recommended_data["results"][:20]: # Limit to 20 for this catalog
                 items.append({
@@ -414,7 +612,46 @@ def catalog(type_, id_, extra_args=None):
                     "genres": [g["name"] for g in movie.get("genres", [])]
                 })
 
-    return jsonify({"metas": items})
+    return items
+
+# --- Addon Endpoints ---
+
+def is_cacheable_catalog(rv):
+    """Empty catalog pages usually mean a failed upstream or a cold feed, so they are never cached."""
+    return bool(rv["metas"])
+
+# How long Stremio clients may reuse catalog/meta/manifest responses before revalidating
+CLIENT_CACHE_MAX_AGE = 1800
+
+@app.after_request
+def add_cache_headers(response):
+    """Lets clients cache addon responses and answers If-None-Match revalidations with a 304."""
+    if request.endpoint in ("manifest", "catalog", "meta") and response.status_code == 200:
+        if request.endpoint == "catalog" and not is_cacheable_catalog(orjson.loads(response.get_data())):
+            response.cache_control.no_store = True # Same rule as the server-side page cache
+            return response
+        response.cache_control.public = True
+        response.cache_control.max_age = CLIENT_CACHE_MAX_AGE
+        response.add_etag() # Hash of the body
+        response = response.make_conditional(request)
+    return response
+
+# The manifest is static, so read it once and serve the raw bytes
+with open(os.path.join(app.root_path, 'manifest.json'), 'rb') as f:
+    _MANIFEST_BYTES = f.read()
+orjson.loads(_MANIFEST_BYTES) # Fail at startup rather than serve a broken manifest
+
+@app.route('/manifest.json')
+def manifest():
+    return Response(_MANIFEST_BYTES, mimetype='application/json')
+
+@app.route('/catalog/<type_>/<id_>.json', defaults={'extra_args': None})
+@app.route('/catalog/<type_>/<id_>/<extra_args>.json')
+@cache.cached(timeout=CACHE_TIMEOUT, make_cache_key=catalog_cache_key, response_filter=is_cacheable_catalog)
+def catalog(type_, id_, extra_args):
+    extra = parse_extra_args(extra_args)
+    items = get_catalog_items(id_, genre=extra.get('genre'), year=extra.get('year'), skip=int(extra.get('skip', 0)))
+    return {"metas": items} # A plain dict so the rendered page can be cached; Flask turns it into JSON
 
 
 @app.route('/meta/<type_>/<id_>.json')
@@ -425,10 +662,10 @@ def meta(type_, id_):
     imdb_id = id_
     if id_.startswith("tt"):
         imdb_id = id_
-        tmdb_meta = get_meta_from_tmdb("imdb", imdb_id, type_)
+        tmdb_meta = get_cached_response(f"tmdb_meta_{type_}_{imdb_id}", lambda: get_meta_from_tmdb("imdb", imdb_id, type_), *TTL_META)
     elif id_.startswith("tmdb:"):
         tmdb_id = id_.split(":")[1]
-        tmdb_meta = get_meta_from_tmdb("tmdb", tmdb_id, type_)
+        tmdb_meta = get_cached_response(f"tmdb_meta_{type_}_tmdb_{tmdb_id}", lambda: get_meta_from_tmdb("tmdb", tmdb_id, type_), *TTL_META)
     else:
         tmdb_meta = None # Handle other ID types if necessary
 
@@ -452,5 +689,63 @@ def configure():
     return render_template('config_page.html')
 
 
+# --- Background Jobs ---
+# The first page of these catalogs, unfiltered and for their top genres, is kept warm so users
+# rarely wait on TMDb. For latest_tv_shows this maps new EZTV titles before anyone asks for them.
+PREWARM_CATALOGS = { # catalog id: (genres it offers, type used to resolve their TMDb genre IDs)
+    "latest_tv_shows": (GENRES_TV, "series"),
+    "latest_movie_releases": (GENRES_MOVIE, "movie"),
+    "latest_dubbed_anime": (GENRES_ANIME, "tv"),
+    "top_trending_movies": ([], "movie"), # TMDb's trending endpoints ignore with_genres
+    "top_trending_tv_shows": ([], "tv"),
+    "recommended_content": (GENRES_MOVIE, "movie")
+}
+PREWARM_TOP_GENRES = 6
+PREWARM_INTERVAL_MINUTES = 25
+PREWARM_LOCK_TIMEOUT = PREWARM_INTERVAL_MINUTES * 60 - 60 # Expires just before the next run is due
+
+def prewarm_catalogs():
+    """Background job: fetches the popular catalog pages into the cache."""
+    for catalog_id, (genres, genre_type) in PREWARM_CATALOGS.items():
+        # A genre without a TMDb ID isn't filtered on, so it would just re-fetch the unfiltered page
+        filtered_genres = [genre for genre in genres if get_tmdb_genre_id(genre, genre_type)]
+        for genre in [None] + filtered_genres[:PREWARM_TOP_GENRES]:
+            get_catalog_items(catalog_id, genre=genre)
+
+def run_exclusively(lock_name, lock_timeout, job):
+    """Runs a background job unless another worker already took its turn in the last `lock_timeout` seconds."""
+    try:
+        acquired = cache.add(f"lock:{lock_name}", 1, timeout=lock_timeout) # Atomic (SET NX) on Redis
+    except Exception as e:
+        print(f"Cache lock failed ({lock_name}): {e}")
+        acquired = True # No shared cache to coordinate through; just run it
+    if acquired:
+        job()
+    return acquired
+
+def warm_up():
+    """Startup job: the worker that wins the first EZTV poll also runs the first pre-warm, after the
+    poll has filled eztv_latest_shows (otherwise latest_tv_shows would have nothing to warm)."""
+    if run_exclusively("refresh_eztv", EZTV_LOCK_TIMEOUT, refresh_eztv):
+        run_exclusively("prewarm_catalogs", PREWARM_LOCK_TIMEOUT, prewarm_catalogs)
+
+# Every gunicorn worker runs a scheduler, but the cache locks let only one of them run each job per interval.
+scheduler = BackgroundScheduler(daemon=True)
+
+def start_scheduler():
+    """Starts the background jobs. Called once per worker process from gunicorn's post_worker_init hook
+    (see gunicorn.conf.py) or when running app.py directly, so importing the module never fires network jobs."""
+    if scheduler.running:
+        return
+    scheduler.add_job(run_exclusively, "interval", args=("refresh_eztv", EZTV_LOCK_TIMEOUT, refresh_eztv),
+                      minutes=EZTV_REFRESH_MINUTES)
+    scheduler.add_job(run_exclusively, "interval", args=("prewarm_catalogs", PREWARM_LOCK_TIMEOUT, prewarm_catalogs),
+                      minutes=PREWARM_INTERVAL_MINUTES)
+    scheduler.add_job(warm_up, next_run_time=datetime.now()) # One-off, right away
+    scheduler.start()
+
+
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=7000)
\ No newline at end of file
+    # Local testing only; in production run under gunicorn (see README)
+    start_scheduler()
+    app.run(host='0.0.0.0', port=7000, threaded=True)
\ No newline at end of file
@@ -0,0 +1,7 @@
+# Picked up automatically by gunicorn when started from the project directory.
+
+def post_worker_init(worker):
+    # Runs in each worker after gevent has patched it and the app is loaded (also with --preload,
+    # where a scheduler thread started in the master would not survive the fork).
+    from app import start_scheduler
+    start_scheduler()